@@ -1,8 +1,40 @@
-import os
+import re
+import shutil
 from pathlib import Path
 from typing import Callable, Optional
 
 from yt_dlp import YoutubeDL
+from yt_dlp.utils import download_range_func
+
+
+# quality -> yt-dlp format selector for common values; other "NNNp" values are built on demand
+_QUALITY_FMT = {
+    "best": "bv*+ba/b",
+    **{
+        f"{h}p": f"bv*[height<=?{h}]+ba/b[height<=?{h}]"
+        for h in (2160, 1440, 1080, 720, 480, 360, 240, 144)
+    },
+}
+
+_QUALITY_RE = re.compile(r"(\d+)p")
+
+# Options shared by every download; per-call values are layered on top
+_BASE_YDL_OPTS = {
+    "merge_output_format": "mp4",
+    "concurrent_fragment_downloads": 16,
+    "http_chunk_size": 10485760,  # fetch progressive files in 10 MiB range requests
+    "retries": 10,
+    "fragment_retries": 10,
+    "continuedl": True,
+    "nopart": False,
+}
+
+
+def uses_aria2c(ffmpeg_location: Optional[Path] = None) -> bool:
+    """Whether download_video hands transfers to aria2c, which writes the file in scattered segments."""
+    # Only hand off to aria2c when ffmpeg is around for the merge step
+    ffmpeg_s = str(ffmpeg_location) if ffmpeg_location else shutil.which("ffmpeg")
+    return bool(ffmpeg_s and shutil.which("aria2c"))
 
 
 def download_video(
@@ -15,50 +47,64 @@ def download_video(
     playlist: bool = False,
     subtitles: bool = False,
     ffmpeg_location: Optional[Path] = None,
+    start_seconds: Optional[float] = None,
+    end_seconds: Optional[float] = None,
     on_progress: Optional[Callable[[dict], None]] = None,
 ) -> Path:
     """
     Download a single video or a playlist entry using yt-dlp and return the output file path.
+
+    If start_seconds/end_seconds are given only that section is downloaded; the cut is done by
+    ffmpeg while streaming and is keyframe-aligned (no re-encode).
     """
     output_dir.mkdir(parents=True, exist_ok=True)
+    # yt-dlp needs ffmpeg to merge separate video/audio streams and to cut sections
+    ffmpeg_s = str(ffmpeg_location) if ffmpeg_location else shutil.which("ffmpeg")
+    cookies_s = str(cookies) if cookies else None
 
-    # map quality to yt-dlp format selector
-    max_height = None
-    if quality and quality.endswith("p") and quality[:-1].isdigit():
-        try:
-            max_height = int(quality[:-1])
-        except Exception:
-            max_height = None
-    if max_height:
-        fmt = f"bv*[height<=?{max_height}]+ba/b[height<=?{max_height}]"
-    else:
-        fmt = "bv*+ba/b"
+    fmt = _QUALITY_FMT.get(quality)
+    if fmt is None:
+        match = _QUALITY_RE.fullmatch(quality or "")
+        if match:
+            h = int(match.group(1))
+            fmt = f"bv*[height<=?{h}]+ba/b[height<=?{h}]"
+        else:
+            fmt = _QUALITY_FMT["best"]
 
     def _hook(d: dict) -> None:
         if on_progress:
             on_progress(d)
 
     ydl_opts = {
-        "outtmpl": os.path.join(str(output_dir), "%(title).200s [%(id)s].%(ext)s"),
+        **_BASE_YDL_OPTS,
+        "outtmpl": output_dir.joinpath("%(title).200s [%(id)s].%(ext)s").as_posix(),
         "format": fmt,
-        "merge_output_format": "mp4",
-        "concurrent_fragment_downloads": 4,
         "noplaylist": not playlist,
-        "ignoreerrors": False,
-        "retries": 10,
-        "fragment_retries": 10,
-        "continuedl": True,
-        "nopart": False,
         "progress_hooks": [_hook],
-        "ffmpeg_location": str(ffmpeg_location) if ffmpeg_location else None,
-        "proxy": proxy,
-        "cookiefile": str(cookies) if cookies else None,
-        "writesubtitles": subtitles,
-        "embedsubtitles": subtitles,
-        "subtitleslangs": ["zh-Hans", "zh", "en"] if subtitles else [],
     }
+    if ffmpeg_s:
+        ydl_opts["ffmpeg_location"] = ffmpeg_s
+    if proxy:
+        ydl_opts["proxy"] = proxy
+    if cookies_s:
+        ydl_opts["cookiefile"] = cookies_s
+    if subtitles:
+        ydl_opts["writesubtitles"] = True
+        ydl_opts["embedsubtitles"] = True
+        ydl_opts["subtitleslangs"] = ["zh-Hans", "zh", "en"]
+    if uses_aria2c(ffmpeg_location):
+        ydl_opts["external_downloader"] = {"default": "aria2c"}
+        ydl_opts["external_downloader_args"] = {
+            "aria2c": ["-x", "16", "-s", "16", "-k", "1M", "--max-connection-per-server=16"],
+        }
+    if start_seconds is not None or end_seconds is not None:
+        # Keep sections apart from a full download of the same video in the same directory
+        ydl_opts["outtmpl"] = output_dir.joinpath("%(title).200s [%(id)s] %(section_start)s-%(section_end)s.%(ext)s").as_posix()
+        ydl_opts["download_ranges"] = download_range_func(
+            None, [(start_seconds or 0.0, end_seconds if end_seconds is not None else float("inf"))]
+        )
 
-    with YoutubeDL({k: v for k, v in ydl_opts.items() if v is not None}) as ydl:
+    with YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(url, download=True)
         # Determine the resulting file path
         if isinstance(info, dict):
@@ -1,20 +1,94 @@
+import collections
+import functools
+import json
+import re
 import threading
-import queue
 import io
 import sys
 from pathlib import Path
-from typing import Optional
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
 import tempfile
 import subprocess
 import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import cv2
+import numpy as np
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from video_to_pdf_phash import extract_frames_to_pdf, parse_crop
-from downloader import download_video
+from video_to_pdf_phash import extract_frames_to_pdf, parse_crop, seek_capture
+from downloader import download_video, uses_aria2c
 
+# Hardware H.264 encoders in order of preference; libx264 is the software fallback
+HW_H264_ENCODERS = ("h264_nvenc", "h264_qsv", "h264_videotoolbox")
+
+
+# The packaged GUI has no console (console=False in the spec); without this every ffmpeg/ffprobe
+# call would flash a console window on Windows
+_NO_WINDOW = {"creationflags": subprocess.CREATE_NO_WINDOW} if sys.platform == "win32" else {}
+
+
+@dataclass(frozen=True)
+class FFmpegCaps:
+    path: Optional[str]
+    ffprobe_path: Optional[str]
+
+
+@functools.lru_cache(maxsize=1)
+def ffmpeg_caps() -> FFmpegCaps:
+    """Locate ffmpeg/ffprobe on PATH, once per process. Cheap enough for the Tk thread."""
+    return FFmpegCaps(path=shutil.which("ffmpeg"), ffprobe_path=shutil.which("ffprobe"))
+
+
+def _encoder_works(ffmpeg: str, encoder: str) -> bool:
+    """Encode one synthetic frame; static builds list NVENC/QSV even without the hardware."""
+    try:
+        res = subprocess.run(
+            [ffmpeg, "-hide_banner", "-v", "error", "-f", "lavfi", "-i", "nullsrc=s=256x256",
+             "-frames:v", "1", "-c:v", encoder, "-f", "null", "-"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10, **_NO_WINDOW,
+        )
+        return res.returncode == 0
+    except Exception:
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def detect_video_encoder() -> str:
+    """Return the first hardware H.264 encoder that passes a test encode, else libx264, once per process.
+
+    Runs subprocesses for up to several seconds; call it off the Tk thread.
+    """
+    ffmpeg = ffmpeg_caps().path
+    if not ffmpeg:
+        return "libx264"
+    try:
+        res = subprocess.run([ffmpeg, "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=10,
+                             **_NO_WINDOW)
+        # Listed by the build, not necessarily usable on this machine
+        encoders = frozenset(line.split()[1] for line in res.stdout.splitlines() if len(line.split()) >= 2)
+    except Exception:
+        return "libx264"
+    for encoder in HW_H264_ENCODERS:
+        if encoder in encoders and _encoder_works(ffmpeg, encoder):
+            return encoder
+    return "libx264"
+
+
+# 秒 / mm:ss / hh:mm:ss, seconds may carry a fraction ("5." and ".5" too); hours only when minutes are given
+TIME_RE = re.compile(r"^(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d*)?|\.\d+)$")
+
+# Log polling interval: ~60 Hz while output flows, backing off to this ceiling when idle
+LOG_POLL_MIN_MS = 16
+LOG_POLL_MAX_MS = 250
+# Probe the resolution of a partial download once this much of it is on disk
+PARTIAL_PROBE_BYTES = 1 << 20
+# The log widget keeps at most this many lines and is redrawn at most every LOG_RENDER_INTERVAL seconds
+LOG_MAX_LINES = 2000
+LOG_RENDER_INTERVAL = 0.1
 
 def _enable_windows_dpi_awareness() -> None:
     if sys.platform != 'win32':
@@ -44,16 +118,35 @@ def _enable_windows_dpi_awareness() -> None:
 
 
 class StreamToQueue(io.TextIOBase):
-    def __init__(self, line_queue: "queue.Queue[str]") -> None:
-        self._queue = line_queue
+    """Buffers writes and forwards whole lines, so print fragments don't become separate queue items."""
+
+    MAX_BUFFER = 4096
+
+    def __init__(self, post: Callable[[str], None]) -> None:
+        self._post = post
+        self._buf = io.StringIO()
+        self._lock = threading.Lock()
 
     def write(self, s: str) -> int:
-        if s:
-            self._queue.put(s)
+        if not s:
+            return 0
+        with self._lock:
+            self._buf.write(s)
+            # \r ends an in-place progress line, forward it like a newline
+            if "\n" in s or "\r" in s or self._buf.tell() >= self.MAX_BUFFER:
+                self._flush_locked()
         return len(s)
 
     def flush(self) -> None:
-        return None
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        data = self._buf.getvalue()
+        if data:
+            self._post(data)
+            self._buf.seek(0)
+            self._buf.truncate()
 
 
 class App(tk.Tk):
@@ -67,60 +160,333 @@ class App(tk.Tk):
         except Exception:
             pass
         self.geometry("760x680")
+        # Hardware encoder test encodes run in the background; only the re-encoding trim waits for them
+        self._video_encoder = "libx264"
+        self._video_encoder_ready = threading.Event()
+        threading.Thread(target=self._load_video_encoder, daemon=True).start()
         self._build_ui()
 
-        self._log_queue: "queue.Queue[str]" = queue.Queue()
+        # Worker threads append to the deque (append/popleft are thread-safe) and set the event to
+        # request an immediate drain on the Tk thread
+        self._log_deque: "collections.deque[str]" = collections.deque()
+        self._log_event = threading.Event()
+        self._log_lines: "collections.deque[str]" = collections.deque(maxlen=LOG_MAX_LINES)
+        self._log_current = ""  # last line, not yet terminated by a newline
+        self._log_cr_pending = False
+        self._log_dirty = False
+        self._log_rendered_at = 0.0
+        self._log_poll_ms = LOG_POLL_MIN_MS
+        # Latest download progress as raw numbers, written by the yt-dlp hook and formatted on the Tk thread;
+        # "seq" increments on every update so the UI only redraws when something changed. Numbers are
+        # coalesced, but each file's "finished" is kept in its own list so none is lost between ticks
+        # (bv*+ba downloads two files)
+        self._progress_lock = threading.Lock()
+        self._progress_state: dict = {"seq": 0, "finished": []}
+        self._progress_shown_seq = 0
         self._worker: Optional[threading.Thread] = None
-        self.after(100, self._drain_log)
+        self.after(self._log_poll_ms, self._poll_log)
+        self.after(100, self._check_video_encoder)
+
+    def _load_video_encoder(self) -> None:
+        try:
+            self._video_encoder = detect_video_encoder()
+        finally:
+            self._video_encoder_ready.set()
+
+    def _check_video_encoder(self) -> None:
+        # Polled from the Tk thread: Tk calls from the probe thread could run before mainloop starts
+        if not self._video_encoder_ready.is_set():
+            self.after(100, self._check_video_encoder)
+            return
+        encoder = self._video_encoder
+        if encoder == "libx264":
+            self.use_hwenc_var.set(False)
+            self.hw_cb.configure(text="硬件编码 (不可用)")
+        else:
+            self.use_hwenc_var.set(True)
+            self.hw_cb.configure(text=f"硬件编码 ({encoder})")
+            self.hw_cb.state(["!disabled"])
 
     def _parse_time_to_seconds(self, text: str) -> Optional[float]:
         s = (text or "").strip()
         if not s:
             return None
-        try:
-            parts = s.split(":")
-            if len(parts) == 1:
-                return float(parts[0])
-            if len(parts) == 2:
-                m = int(parts[0])
-                sec = float(parts[1])
-                return m * 60 + sec
-            if len(parts) == 3:
-                h = int(parts[0])
-                m = int(parts[1])
-                sec = float(parts[2])
-                return h * 3600 + m * 60 + sec
-            raise ValueError("invalid format")
-        except Exception:
+        match = TIME_RE.match(s)
+        if match is None:
             raise ValueError("时间格式应为 秒 或 mm:ss 或 hh:mm:ss，可带小数")
+        h, m, sec = match.groups()
+        return int(h or 0) * 3600 + int(m or 0) * 60 + float(sec)
 
     def _ffmpeg_path(self) -> Optional[str]:
-        return shutil.which("ffmpeg")
+        return ffmpeg_caps().path
 
-    def _trim_video_with_ffmpeg(self, src: Path, dst: Path, start_s: Optional[float], end_s: Optional[float]) -> None:
+    def _ffprobe_path(self) -> Optional[str]:
+        return ffmpeg_caps().ffprobe_path
+
+    def _probe_video_stream(self, src: Path) -> Optional[Tuple[str, float, float]]:
+        """Return (codec_name, fps, container start_time) of the first video stream."""
+        ffprobe = self._ffprobe_path()
+        if not ffprobe:
+            return None
+        try:
+            res = subprocess.run(
+                [ffprobe, "-v", "error", "-select_streams", "v:0", "-show_entries",
+                 "stream=codec_name,avg_frame_rate:format=start_time", "-of", "json", str(src)],
+                capture_output=True, text=True, timeout=10, **_NO_WINDOW,
+            )
+        except subprocess.TimeoutExpired:
+            return None
+        if res.returncode != 0:
+            return None
+        try:
+            info = json.loads(res.stdout)
+            stream = info["streams"][0]
+            num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+            fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+            start_time = float(info.get("format", {}).get("start_time") or 0.0)
+            return stream["codec_name"], fps if fps > 0 else 25.0, start_time
+        except (KeyError, IndexError, ValueError, ZeroDivisionError):
+            return None
+
+    def _probe_duration(self, src: Path) -> Optional[float]:
+        ffprobe = self._ffprobe_path()
+        if not ffprobe:
+            return None
+        try:
+            res = subprocess.run(
+                [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(src)],
+                capture_output=True, text=True, timeout=10, **_NO_WINDOW,
+            )
+            return float(res.stdout.strip()) if res.returncode == 0 else None
+        except (subprocess.TimeoutExpired, ValueError):
+            return None
+
+    def _clip_ok(self, dst: Path, expected: Optional[float]) -> bool:
+        """Check that ffmpeg wrote a playable clip of (at least roughly) the expected duration.
+
+        ffmpeg exits 0 and writes a header-only file when nothing falls inside the range, so the file
+        size alone is not enough. Without ffprobe only the size can be checked.
+        """
+        if not dst.exists() or dst.stat().st_size == 0:
+            return False
+        if not self._ffprobe_path():
+            return True
+        got = self._probe_duration(dst)
+        if got is None or got <= 0:
+            return False
+        return expected is None or got >= expected - 1.0
+
+    def _probe_resolution(self, src: Path, ffprobe_only: bool = False) -> Tuple[int, int]:
+        """Return (width, height) of the first video stream, or (0, 0) if unknown.
+
+        ffprobe_only skips the OpenCV fallback, for files still being written.
+        """
+        ffprobe = self._ffprobe_path()
+        if ffprobe:
+            try:
+                res = subprocess.run(
+                    [ffprobe, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height",
+                     "-of", "csv=p=0:s=x", str(src)],
+                    capture_output=True, text=True, timeout=5, **_NO_WINDOW,
+                )
+                w, _, h = res.stdout.strip().partition("x")
+                if res.returncode == 0 and w.isdigit() and h.isdigit():
+                    return int(w), int(h)
+            except Exception:
+                pass
+        if ffprobe_only:
+            return 0, 0
+        # No (working) ffprobe: let OpenCV open the container instead
+        try:
+            cap_probe = cv2.VideoCapture(str(src))
+            if not cap_probe.isOpened():
+                return 0, 0
+            width = int(cap_probe.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+            height = int(cap_probe.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+            if not width or not height:
+                ok, frame0 = cap_probe.read()
+                if ok and frame0 is not None:
+                    height, width = frame0.shape[:2]
+            cap_probe.release()
+            return width, height
+        except Exception:
+            return 0, 0
+
+    def _probe_packets(self, src: Path, start_s: float, end_s: Optional[float], start_time: float = 0.0) -> List[Tuple[float, bool]]:
+        """Return (pts, is_keyframe) of the first video stream's packets around [start_s, end_s].
+
+        Packets come in decode order, which is also the order a stream copy writes them. Times are
+        relative to the container start_time, like ffmpeg's input -ss; ffprobe reports absolute
+        stream timestamps, so start_time is subtracted. An empty list means the probe failed.
+        """
+        ffprobe = self._ffprobe_path()
+        if not ffprobe:
+            return []
+        # Only read packets around the requested range; packet flags carry the keyframe marker, no decoding needed.
+        # Without an end only K1 matters, so stop after a bounded number of packets instead of scanning to EOF
+        interval = (f"{start_time + max(0.0, start_s - 1.0):.6f}%"
+                    + (f"{start_time + end_s + 1.0:.6f}" if end_s is not None else "+#3000"))
+        try:
+            res = subprocess.run(
+                [ffprobe, "-v", "error", "-select_streams", "v:0", "-read_intervals", interval,
+                 "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(src)],
+                capture_output=True, text=True, timeout=60, **_NO_WINDOW,
+            )
+        except subprocess.TimeoutExpired:
+            return []
+        if res.returncode != 0:
+            return []
+        packets: List[Tuple[float, bool]] = []
+        for line in res.stdout.splitlines():
+            parts = line.strip().split(",")
+            if len(parts) < 2:
+                continue
+            try:
+                t = float(parts[0]) - start_time
+            except ValueError:
+                # A packet without pts would throw off every frame count below
+                return []
+            packets.append((t, "K" in parts[1]))
+        return packets
+
+    def _video_encode_args(self, encoder: str, x264_preset: str, crf: int) -> List[str]:
+        if encoder == "h264_nvenc":
+            video = ["-c:v", encoder, "-preset", "p4", "-cq", "22", "-g", "48"]
+        elif encoder == "h264_qsv":
+            # QSV has no -cq; -global_quality is its constant-quality knob
+            video = ["-c:v", encoder, "-global_quality", "22", "-g", "48"]
+        elif encoder == "h264_videotoolbox":
+            video = ["-c:v", encoder, "-q:v", "55", "-g", "48"]
+        else:
+            video = ["-c:v", "libx264", "-preset", x264_preset, "-crf", str(crf), "-tune", "fastdecode",
+                     "-x264-params", "keyint=48:min-keyint=48"]
+        return video + ["-threads", "0"]
+
+    def _encode_args(self, encoder: str, x264_preset: str, crf: int) -> List[str]:
+        return self._video_encode_args(encoder, x264_preset, crf) + ["-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart"]
+
+    def _smart_cut(self, ffmpeg: str, src: Path, dst: Path, start_s: Optional[float], end_s: Optional[float],
+                   encoder: str = "libx264", x264_preset: str = "faster", crf: int = 20) -> bool:
+        """Cut [start_s, end_s] re-encoding only the partial GOPs at both ends.
+
+        The span between the first keyframe K1 >= start and the last keyframe K2 <= end is
+        stream-copied; head [start, K1) and tail [K2, end) are re-encoded concurrently, then the
+        three parts are joined with the concat demuxer. Every part is bounded by a frame count
+        taken from the ffprobe packet list rather than by -t, which a stream copy applies to DTS and
+        so gets wrong around reordered B-frames. Parts are written as MPEG-TS with Annex B H.264, so
+        each part carries its own SPS/PPS in-band and all share the 90 kHz time base; the re-encoded
+        ends need not match the source profile/level. Audio is dropped (-an): the extractor never
+        reads it and the source audio codec may differ from what an encode produces.
+        Returns False when the source is not suitable (no ffprobe, non-H.264 video, no keyframe in
+        range) so the caller can fall back.
+        """
+        stream = self._probe_video_stream(src)
+        if stream is None or stream[0] != "h264":
+            # Re-encoded head/tail are H.264; the copied middle has to be H.264 as well
+            return False
+        _, fps, start_time = stream
+        start = start_s or 0.0
+        packets = self._probe_packets(src, start, end_s, start_time)
+        keys = [i for i, (t, key) in enumerate(packets)
+                if key and t >= start and (end_s is None or t <= end_s)]
+        if not keys:
+            return False
+        i1, i2 = keys[0], keys[-1]
+        k1, k2 = packets[i1][0], packets[i2][0]
+        # Presentation-order frame counts for the re-encoded ends, decode-order packet count for the copy
+        n_head = sum(1 for t, _ in packets if start <= t < k1)
+        n_mid = i2 - i1
+        n_tail = sum(1 for t, _ in packets if end_s is not None and k2 <= t < end_s)
+        # A copy seek snaps back to the previous keyframe, so seeking half a frame past K1 lands
+        # exactly on K1; the tail encode seeks half a frame before K2 so its first frame is K2
+        half = 0.5 / fps
+
+        encode = self._video_encode_args(encoder, x264_preset, crf)
+        copy = ["-c:v", "copy", "-bsf:v", "h264_mp4toannexb"]
+        # (seek, frame count, codec args) for each part; count None means "until end of input"
+        parts: List[Tuple[float, Optional[int], List[str]]] = []
+        if n_head:
+            parts.append((start, n_head, encode))
+        if end_s is None:
+            parts.append((k1 + half, None, copy))
+        else:
+            if n_mid:
+                parts.append((k1 + half, n_mid, copy))
+            if n_tail:
+                parts.append((k2 - half, n_tail, encode))
+        if not parts:
+            return False
+
+        with tempfile.TemporaryDirectory(prefix="video2pdf_cut_") as tmp:
+            tmp_dir = Path(tmp)
+            part_paths: List[Path] = []
+            procs = []
+            for i, (seg_start, seg_frames, codec_args) in enumerate(parts):
+                part_p = tmp_dir / f"part{i}.ts"
+                seg_args = [ffmpeg, "-y", "-ss", f"{max(0.0, seg_start):.6f}", "-i", str(src)]
+                if seg_frames is not None:
+                    seg_args += ["-frames:v", str(seg_frames)]
+                seg_args += ["-an", *codec_args, "-f", "mpegts", str(part_p)]
+                part_paths.append(part_p)
+                procs.append(subprocess.Popen(seg_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                              **_NO_WINDOW))
+            codes = [p.wait() for p in procs]
+            if any(codes) or not all(p.exists() and p.stat().st_size > 0 for p in part_paths):
+                return False
+
+            list_p = tmp_dir / "parts.txt"
+            list_p.write_text("".join(f"file '{p.as_posix()}'\n" for p in part_paths), encoding="utf-8")
+            concat_args = [ffmpeg, "-y", "-f", "concat", "-safe", "0", "-i", str(list_p), "-c", "copy",
+                           "-movflags", "+faststart", str(dst)]
+            res = subprocess.run(concat_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=False,
+                                 **_NO_WINDOW)
+            return res.returncode == 0 and dst.exists() and dst.stat().st_size > 0
+
+    def _trim_video_with_ffmpeg(self, src: Path, dst: Path, start_s: Optional[float], end_s: Optional[float],
+                                x264_preset: str = "faster", crf: int = 20, use_hwenc: bool = True) -> None:
         ffmpeg = self._ffmpeg_path()
         if not ffmpeg:
             raise RuntimeError("未找到 ffmpeg，请先安装并加入 PATH")
 
-        args = [ffmpeg, "-y"]
         duration = None
         if start_s is not None and end_s is not None and end_s > start_s:
             duration = end_s - start_s
-        if start_s is not None:
-            args += ["-ss", f"{start_s:.3f}"]
-        args += ["-i", str(src)]
-        if duration is not None:
-            args += ["-t", f"{duration:.3f}"]
-
-        fast_args = args + ["-c", "copy", str(dst)]
-        res = subprocess.run(fast_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=False)
-        if res.returncode == 0 and dst.exists() and dst.stat().st_size > 0:
+        expected = duration
+        if expected is None and start_s is not None:
+            src_duration = self._probe_duration(src)
+            if src_duration is not None:
+                expected = max(0.0, src_duration - start_s)
+        seek = ["-ss", f"{start_s:.3f}"] if start_s is not None else []
+        limit = ["-t", f"{duration:.3f}"] if duration is not None else []
+        args = [ffmpeg, "-y", *seek, "-i", str(src), *limit]
+
+        # Stream copy: regenerate missing pts and shift the result to start at zero, so OpenCV can
+        # open and seek the clip without a re-encode
+        fast_args = [ffmpeg, "-y", *seek, "-fflags", "+genpts", "-i", str(src), *limit,
+                     "-c", "copy", "-avoid_negative_ts", "make_zero", "-movflags", "+faststart", str(dst)]
+        res = subprocess.run(fast_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=False,
+                             **_NO_WINDOW)
+        if res.returncode == 0 and self._clip_ok(dst, expected):
             return
 
-        slow_args = args + ["-c:v", "libx264", "-preset", "fast", "-crf", "23", "-c:a", "aac", "-b:a", "192k", str(dst)]
-        res2 = subprocess.run(slow_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=False)
-        if res2.returncode != 0 or not dst.exists() or dst.stat().st_size == 0:
-            raise RuntimeError("ffmpeg 剪切失败")
+        # Hardware encoders may be compiled in without a usable device; retry on libx264 then
+        encoders = ["libx264"]
+        self._video_encoder_ready.wait()
+        hw_encoder = self._video_encoder
+        if use_hwenc and hw_encoder != "libx264":
+            encoders.insert(0, hw_encoder)
+        for encoder in encoders:
+            # Keyframe-aligned copy for the bulk, re-encode only the GOPs around the cut points
+            if self._smart_cut(ffmpeg, src, dst, start_s, end_s, encoder, x264_preset, crf) and self._clip_ok(dst, expected):
+                return
+
+            # Last resort (e.g. non-H.264 source or range inside a single GOP): re-encode the whole clip
+            slow_args = args + self._encode_args(encoder, x264_preset, crf) + [str(dst)]
+            res2 = subprocess.run(slow_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=False,
+                                  **_NO_WINDOW)
+            if res2.returncode == 0 and self._clip_ok(dst, expected):
+                return
+        raise RuntimeError("ffmpeg 剪切失败")
 
     def _build_ui(self) -> None:
         pad = 8
@@ -149,6 +515,21 @@ class App(tk.Tk):
         self._row(file_frame, "开始时间(可空)", self.start_time_var)
         self._row(file_frame, "结束时间(可空)", self.end_time_var)
 
+        # Re-encode settings used when the clip cannot be stream-copied
+        self.preset_var = tk.StringVar(value="faster")
+        self.crf_var = tk.StringVar(value="20")
+        enc_row = ttk.Frame(file_frame)
+        enc_row.pack(fill=tk.X, pady=(4, 0))
+        ttk.Label(enc_row, text="剪切重编码 preset", width=20).pack(side=tk.LEFT)
+        ttk.Entry(enc_row, textvariable=self.preset_var, width=12).pack(side=tk.LEFT)
+        ttk.Label(enc_row, text="CRF").pack(side=tk.LEFT, padx=(12, 0))
+        ttk.Entry(enc_row, textvariable=self.crf_var, width=6).pack(side=tk.LEFT, padx=(8, 0))
+        # Enabled by _check_video_encoder once a hardware encoder has passed its test encode
+        self.use_hwenc_var = tk.BooleanVar(value=False)
+        self.hw_cb = ttk.Checkbutton(enc_row, text="硬件编码 (检测中)", variable=self.use_hwenc_var)
+        self.hw_cb.pack(side=tk.LEFT, padx=(12, 0))
+        self.hw_cb.state(["disabled"])
+
         # Time format hint
         hint_row = ttk.Frame(file_frame)
         hint_row.pack(fill=tk.X, pady=(2, 0))
@@ -224,6 +605,10 @@ class App(tk.Tk):
         action.pack(fill=tk.X, pady=(0, pad))
         self.run_btn = ttk.Button(action, text="开始运行", command=self._on_run)
         self.run_btn.pack(side=tk.LEFT)
+        self.progress = ttk.Progressbar(action, mode="determinate", maximum=100, length=200)
+        self.progress.pack(side=tk.LEFT, padx=(12, 0))
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(action, textvariable=self.status_var).pack(side=tk.LEFT, padx=(8, 0))
 
         self.log = tk.Text(main, height=18, wrap=tk.WORD)
         self.log.pack(fill=tk.BOTH, expand=True)
@@ -276,17 +661,132 @@ class App(tk.Tk):
             pass
 
     def _append_log(self, text: str) -> None:
-        self.log.insert(tk.END, text)
+        for piece in re.split(r"([\r\n])", text):
+            if piece == "\n":
+                self._log_lines.append(self._log_current)
+                self._log_current = ""
+                self._log_cr_pending = False
+            elif piece == "\r":
+                # Carriage return rewinds to the start of the current line: the next text replaces it
+                self._log_cr_pending = True
+            elif piece:
+                if self._log_cr_pending:
+                    self._log_current = ""
+                    self._log_cr_pending = False
+                self._log_current += piece
+        self._log_dirty = True
+
+    def _render_log(self) -> None:
+        text = "\n".join(self._log_lines)
+        if self._log_lines:
+            text += "\n"
+        self.log.replace("1.0", tk.END, text + self._log_current)
         self.log.see(tk.END)
+        self._log_dirty = False
+        self._log_rendered_at = time.monotonic()
+
+    def _clear_log(self) -> None:
+        self._log_lines.clear()
+        self._log_current = ""
+        self._log_cr_pending = False
+        self._render_log()
+
+    def _set_progress(self, d: dict) -> None:
+        """yt-dlp progress hook body: store the raw numbers, no formatting off the Tk thread."""
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        with self._progress_lock:
+            state = self._progress_state
+            if d.get("status") == "finished":
+                state["finished"].append(total)
+            state["status"] = d.get("status")
+            state["downloaded_bytes"] = d.get("downloaded_bytes")
+            state["total_bytes"] = total
+            state["fragment_index"] = d.get("fragment_index")
+            state["fragment_count"] = d.get("fragment_count")
+            state["speed"] = d.get("speed")
+            state["eta"] = d.get("eta")
+            state["seq"] += 1
+
+    def _show_progress(self) -> bool:
+        """Render the latest progress state if it changed since the last tick."""
+        with self._progress_lock:
+            if self._progress_state["seq"] == self._progress_shown_seq:
+                return False
+            state = dict(self._progress_state)
+            finished, self._progress_state["finished"] = self._progress_state["finished"], []
+        self._progress_shown_seq = state["seq"]
+
+        for size in finished:
+            size_mb = f"{size / 1048576:.1f}MB" if size else "?"
+            self._append_log(f"[下载完成] 已保存临时文件，大小约 {size_mb}\n")
+        total = state["total_bytes"]
+        if state["status"] == "finished":
+            self.progress.configure(value=100)
+            self.status_var.set("下载完成")
+            return True
+
+        pct = None
+        if total:
+            pct = 100.0 * (state["downloaded_bytes"] or 0) / total
+        elif state["fragment_count"]:
+            pct = 100.0 * (state["fragment_index"] or 0) / state["fragment_count"]
+        text = f"下载中 {pct:5.1f}%" if pct is not None else "下载中"
+        if state["speed"]:
+            text += f"  速度 {state['speed'] / 1e6:5.2f}MB/s"
+        if state["eta"] is not None:
+            text += f"  剩余 {state['eta']:4.0f}s"
+        self.progress.configure(value=pct or 0)
+        self.status_var.set(text)
+        return True
+
+    def _post_log(self, text: str) -> None:
+        """Queue log text from any thread; only flags the Tk-side poll, never touches Tk itself."""
+        self._log_deque.append(text)
+        self._log_event.set()
+
+    def _drain_log(self) -> bool:
+        """Move pending log text and progress into the UI; returns whether anything is still busy."""
+        self._log_event.clear()
+        chunks = []
+        while self._log_deque:
+            chunks.append(self._log_deque.popleft())
+        if chunks:
+            self._append_log("".join(chunks))
+        progressed = self._show_progress()
+        if self._log_dirty and time.monotonic() - self._log_rendered_at >= LOG_RENDER_INTERVAL:
+            self._render_log()
+        return bool(chunks or progressed or self._log_dirty)
+
+    def _poll_log(self) -> None:
+        # Read the flag before draining clears it: new text since the last poll means a worker is active
+        posted = self._log_event.is_set()
+        if self._drain_log() or posted:
+            self._log_poll_ms = LOG_POLL_MIN_MS
+        else:
+            # Idle: back off so an empty log doesn't wake the UI 60 times a second
+            self._log_poll_ms = min(LOG_POLL_MAX_MS, self._log_poll_ms * 2)
+        self.after(self._log_poll_ms, self._poll_log)
+
+    def _select_roi_on_ui_thread(self, frame: np.ndarray) -> Tuple[int, int, int, int]:
+        """Run cv2.selectROI on the Tk thread and block the calling worker until it returns."""
+        done = threading.Event()
+        result: dict = {}
+
+        def select() -> None:
+            try:
+                roi = cv2.selectROI("框选 PPT 区域", frame, showCrosshair=True, fromCenter=False)
+                cv2.destroyWindow("框选 PPT 区域")
+                result["roi"] = tuple(map(int, roi))
+            except Exception as exc:
+                result["error"] = exc
+            finally:
+                done.set()
 
-    def _drain_log(self) -> None:
-        try:
-            while True:
-                chunk = self._log_queue.get_nowait()
-                self._append_log(chunk)
-        except queue.Empty:
-            pass
-        self.after(100, self._drain_log)
+        self.after_idle(select)
+        done.wait()
+        if "error" in result:
+            raise result["error"]
+        return result["roi"]
 
     def _on_run(self) -> None:
         if self._worker and self._worker.is_alive():
@@ -298,112 +798,156 @@ class App(tk.Tk):
             messagebox.showwarning("缺少输入", "请先输入本地视频路径或视频网址")
             return
 
-        self.log.delete("1.0", tk.END)
+        self._clear_log()
+        self.progress.configure(value=0)
+        self.status_var.set("")
         self.run_btn.configure(state=tk.DISABLED)
 
         def work() -> None:
-            stdout = StreamToQueue(self._log_queue)
-            stderr = StreamToQueue(self._log_queue)
+            stdout = StreamToQueue(self._post_log)
+            stderr = StreamToQueue(self._post_log)
+            # Download (or trim) and the resolution probe run side by side
+            pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="video2pdf")
+            probe_future: "Optional[Future[Tuple[int, int]]]" = None
+            # Opened early for seeking/ROI selection; owned here until extract_frames_to_pdf takes it over
+            video_capture: Optional[cv2.VideoCapture] = None
             try:
                 # Determine if input is URL
                 is_url = input_path.lower().startswith(("http://", "https://"))
 
+                # Time range, if provided
+                start_s = None
+                end_s = None
+                try:
+                    start_s = self._parse_time_to_seconds(self.start_time_var.get())
+                except Exception as e:
+                    raise RuntimeError(f"开始时间格式错误: {e}")
+                try:
+                    end_s = self._parse_time_to_seconds(self.end_time_var.get())
+                except Exception as e:
+                    raise RuntimeError(f"结束时间格式错误: {e}")
+                if end_s is not None and start_s is not None and end_s <= start_s:
+                    raise RuntimeError("结束时间必须大于开始时间")
+                has_range = start_s is not None or end_s is not None
+
                 # If URL, download first
                 if is_url:
                     dl_dir_str = self.dldir_var.get().strip()
                     dl_dir = Path(dl_dir_str) if dl_dir_str else Path(tempfile.gettempdir()) / "video2pdf_downloads"
                     print(f"检测到网址输入，开始下载到: {dl_dir}")
+                    # The head of a .part file is only probeable when yt-dlp writes it front to back itself:
+                    # aria2c fills it in scattered segments and section downloads put the moov atom last
+                    partial_probe = not has_range and not uses_aria2c() and self._ffprobe_path() is not None
 
                     def on_progress(d: dict) -> None:
+                        nonlocal probe_future
                         try:
                             status = d.get("status")
-                            if status == "downloading":
-                                p = d.get("_percent_str", "").strip()
-                                s = d.get("_speed_str", "").strip()
-                                eta = d.get("_eta_str", "").strip()
-                                line = f"[下载中] {p}  速度 {s}  剩余 {eta}\r"
-                                self._log_queue.put(line)
-                            elif status == "finished":
-                                total = d.get("total_bytes") or d.get("total_bytes_estimate")
-                                size_mb = f"{(int(total)/1048576):.1f}MB" if total else "?"
-                                self._log_queue.put(f"\n[下载完成] 已保存临时文件，大小约 {size_mb}\n")
+                            # Once the head of a plain single-file HTTP download is on disk, probe it while the
+                            # rest downloads; ffprobe only, an OpenCV handle on the .part could block the
+                            # final rename on Windows
+                            part = d.get("tmpfilename")
+                            if (partial_probe and probe_future is None and status == "downloading" and part
+                                    and (d.get("info_dict") or {}).get("protocol") in ("http", "https")
+                                    and not d.get("fragment_count")
+                                    and (d.get("downloaded_bytes") or 0) > PARTIAL_PROBE_BYTES and Path(part).exists()):
+                                probe_future = pool.submit(self._probe_resolution, Path(part), ffprobe_only=True)
+                            if status in ("downloading", "finished"):
+                                self._set_progress(d)
                         except Exception:
                             pass
 
-                    downloaded_path = download_video(
+                    # With a time range, yt-dlp fetches only that section (cut on the fly by ffmpeg),
+                    # so download and trim overlap instead of running back to back
+                    if has_range:
+                        print(f"仅下载指定时间段: start={start_s if start_s is not None else '未指定'}, end={end_s if end_s is not None else '未指定'}")
+                    download_future = pool.submit(
+                        download_video,
                         url=input_path,
                         output_dir=dl_dir,
+                        start_seconds=start_s,
+                        end_seconds=end_s,
                         on_progress=on_progress,
                     )
-                    input_p = downloaded_path
+                    input_p = download_future.result()
                     print(f"已下载: {input_p}")
+                    # The download is already the requested section
+                    start_s = end_s = None
                 else:
                     input_p = Path(input_path)
-
-                # Optional trimming via ffmpeg if time range provided
-                start_s = None
-                end_s = None
-                try:
-                    start_s = self._parse_time_to_seconds(self.start_time_var.get())
-                except Exception as e:
-                    raise RuntimeError(f"开始时间格式错误: {e}")
-                try:
-                    end_s = self._parse_time_to_seconds(self.end_time_var.get())
-                except Exception as e:
-                    raise RuntimeError(f"结束时间格式错误: {e}")
-
-                if start_s is not None or end_s is not None:
-                    if end_s is not None and start_s is not None and end_s <= start_s:
-                        raise RuntimeError("结束时间必须大于开始时间")
+                    # Trimming keeps the resolution, so the source can be probed right away
+                    probe_future = pool.submit(self._probe_resolution, input_p)
+
+                # A time range on a local file is handled by seeking the capture (reused for extraction)
+                # and stopping at end_s, instead of writing a trimmed copy. Only containers where
+                # OpenCV seeking is unreliable still get cut by ffmpeg first.
+                if start_s:
+                    video_capture = cv2.VideoCapture(str(input_p))
+                    if video_capture.isOpened() and seek_capture(video_capture, start_s):
+                        print(f"已定位到开始时间 {start_s}s，跳过 ffmpeg 剪切")
+                    else:
+                        video_capture.release()
+                        video_capture = None
+                if start_s and video_capture is None:
                     clip_dir = (input_p.parent if input_p.parent.exists() else Path(tempfile.gettempdir())) / "video2pdf_segments"
                     clip_dir.mkdir(parents=True, exist_ok=True)
                     clip_p = clip_dir / (input_p.stem + ".clip.mp4")
                     print(f"检测到剪切参数，开始剪切: start={start_s if start_s is not None else '未指定'}, end={end_s if end_s is not None else '未指定'}")
-                    self._trim_video_with_ffmpeg(input_p, clip_p, start_s, end_s)
+                    x264_preset = self.preset_var.get().strip() or "faster"
+                    crf = int(self.crf_var.get() or 20)
+                    use_hwenc = bool(self.use_hwenc_var.get())
+                    self._trim_video_with_ffmpeg(input_p, clip_p, start_s, end_s, x264_preset=x264_preset, crf=crf,
+                                                 use_hwenc=use_hwenc)
                     input_p = clip_p
+                    start_s = end_s = None
                     print(f"剪切完成: {input_p}")
 
                 # Report video resolution to help manual crop configuration
-                try:
-                    cap_probe = cv2.VideoCapture(str(input_p))
-                    if cap_probe.isOpened():
-                        width = int(cap_probe.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
-                        height = int(cap_probe.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
-                        if not width or not height:
-                            ok, frame0 = cap_probe.read()
-                            if ok and frame0 is not None:
-                                height, width = frame0.shape[:2]
-                        cap_probe.release()
-                        if width and height:
-                            self._log_queue.put(f"\n视频分辨率: {width} x {height}\n")
-                except Exception:
-                    pass
+                width, height = probe_future.result() if probe_future is not None else (0, 0)
+                if not width or not height:
+                    # The partial download may not have been probeable yet
+                    width, height = self._probe_resolution(input_p)
+                if width and height:
+                    self._post_log(f"\n视频分辨率: {width} x {height}\n")
 
                 output_pdf_str = self.output_var.get().strip()
                 output_pdf = Path(output_pdf_str) if output_pdf_str else input_p.with_suffix('.pdf')
                 out_dir_str = self.outdir_var.get().strip()
                 out_dir = Path(out_dir_str) if out_dir_str else input_p.parent / 'slides_phash'
 
-                # Manual ROI selection (takes precedence over auto-crop)
+                # Decode buffers reused for every frame of the extraction
+                frame_buf = np.empty((height, width, 3), np.uint8) if width and height else None
+                gray_buf = np.empty((height, width), np.uint8) if width and height else None
+
+                # Manual ROI selection (takes precedence over auto-crop). The capture and its first
+                # frame are handed to the extractor so the video is only opened and decoded once.
                 manual_crop = None
+                first_frame = None
                 if bool(self.manual_select_var.get()):
                     try:
-                        cap0 = cv2.VideoCapture(str(input_p))
-                        ok, frame = cap0.read()
-                        cap0.release()
-                        if not ok or frame is None:
+                        if video_capture is None:
+                            video_capture = cv2.VideoCapture(str(input_p))
+                        frame = None
+                        if video_capture.isOpened() and video_capture.grab():
+                            ok, frame = video_capture.retrieve(frame_buf)
+                            if not ok:
+                                frame = None
+                        if frame is None:
                             raise RuntimeError("无法读取视频首帧用于框选")
-                        self._log_queue.put("请在弹出的窗口中框选 PPT 区域，按回车确认，Esc 取消。\n")
-                        roi = cv2.selectROI("框选 PPT 区域", frame, showCrosshair=True, fromCenter=False)
-                        cv2.destroyWindow("框选 PPT 区域")
-                        x, y, w, h = map(int, roi)
+                        first_frame = frame
+                        self._post_log("请在弹出的窗口中框选 PPT 区域，按回车确认，Esc 取消。\n")
+                        x, y, w, h = self._select_roi_on_ui_thread(frame)
                         if w > 0 and h > 0:
                             manual_crop = (x, y, w, h)
-                            self._log_queue.put(f"已选择区域: x={x}, y={y}, w={w}, h={h}\n")
+                            self._post_log(f"已选择区域: x={x}, y={y}, w={w}, h={h}\n")
                         else:
-                            self._log_queue.put("已取消框选，继续使用原设置。\n")
+                            self._post_log("已取消框选，继续使用原设置。\n")
                     except Exception as e:
-                        self._log_queue.put(f"框选失败: {e}\n")
+                        self._post_log(f"框选失败: {e}\n")
+                        if video_capture is not None:
+                            video_capture.release()
+                        video_capture = None
+                        first_frame = None
 
                 # Parse numerics with defaults
                 sample_seconds = float(self.sample_var.get() or 0.5)
@@ -425,6 +969,7 @@ class App(tk.Tk):
                 auto_crop_min_area_ratio = float(self.auto_crop_min_area_var.get() or 0.05)
 
                 from contextlib import redirect_stdout, redirect_stderr
+                capture, video_capture = video_capture, None  # extract_frames_to_pdf releases it
                 with redirect_stdout(stdout), redirect_stderr(stderr):
                     extract_frames_to_pdf(
                         video_path=input_p,
@@ -443,12 +988,23 @@ class App(tk.Tk):
                         auto_crop=auto_crop,
                         auto_crop_pad=auto_crop_pad,
                         auto_crop_min_area_ratio=auto_crop_min_area_ratio,
+                        video_capture=capture,
+                        first_frame=first_frame,
+                        start_seconds=start_s,
+                        end_seconds=end_s,
+                        frame_buf=frame_buf,
+                        gray_buf=gray_buf,
                     )
-                self._log_queue.put("\n完成.\n")
+                self._post_log("\n完成.\n")
             except Exception as exc:
-                self._log_queue.put(f"\n错误: {exc}\n")
+                self._post_log(f"\n错误: {exc}\n")
                 messagebox.showerror("运行失败", str(exc))
             finally:
+                if video_capture is not None:
+                    video_capture.release()
+                pool.shutdown(wait=False)
+                stdout.flush()
+                stderr.flush()
                 self.run_btn.configure(state=tk.NORMAL)
 
         self._worker = threading.Thread(target=work, daemon=True)
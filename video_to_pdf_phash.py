@@ -95,6 +95,22 @@ def auto_detect_crop_region(frame_bgr: np.ndarray, pad: int = 6, sat_thresh: int
     return x0, y0, x1 - x0, y1 - y0
 
 
+def seek_capture(cap: cv2.VideoCapture, start_seconds: float, tolerance: float = 0.5) -> bool:
+    """Seek cap to start_seconds and check the position round-trips.
+
+    Returns False for containers where OpenCV seeking is broken, so callers can fall back to cutting with ffmpeg.
+    """
+    if start_seconds <= 0:
+        return True
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps <= 1e-3:
+        return False
+    if not cap.set(cv2.CAP_PROP_POS_FRAMES, int(start_seconds * fps)):
+        return False
+    pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+    return abs(pos_ms / 1000.0 - start_seconds) <= tolerance
+
+
 def extract_frames_to_pdf(
     video_path: Path,
     output_pdf: Path,
@@ -112,10 +128,31 @@ def extract_frames_to_pdf(
     auto_crop: bool,
     auto_crop_pad: int,
     auto_crop_min_area_ratio: float,
+    video_capture: Optional[cv2.VideoCapture] = None,
+    first_frame: Optional[np.ndarray] = None,
+    start_seconds: Optional[float] = None,
+    end_seconds: Optional[float] = None,
+    frame_buf: Optional[np.ndarray] = None,
+    gray_buf: Optional[np.ndarray] = None,
 ) -> None:
-    cap = cv2.VideoCapture(str(video_path))
+    """Extract slide frames from the video and write them into a PDF.
+
+    An already opened ``video_capture`` can be handed over (it is released here) to avoid
+    reopening the file; it is read from its current position and ``first_frame`` is a frame
+    already read from it, used as frame 0. ``start_seconds`` only applies when the video is
+    opened here; ``end_seconds`` stops extraction at that timestamp in either case.
+
+    ``frame_buf`` (H, W, 3 uint8) and ``gray_buf`` (H, W uint8) are optional preallocated buffers
+    sized to the video; decoded frames and grayscale conversions are written into them instead of
+    allocating per frame.
+    """
+    cap = video_capture if video_capture is not None else cv2.VideoCapture(str(video_path))
     if not cap.isOpened():
         raise RuntimeError(f"无法打开视频: {video_path}")
+    if video_capture is None and start_seconds and not seek_capture(cap, start_seconds):
+        cap.release()
+        raise RuntimeError(f"无法定位到开始时间 {start_seconds}s，请先用 ffmpeg 剪切视频")
+    end_ms = end_seconds * 1000.0 if end_seconds is not None else None
 
     fps = cap.get(cv2.CAP_PROP_FPS)
     if not fps or fps <= 1e-3:
@@ -125,6 +162,8 @@ def extract_frames_to_pdf(
     print(f"视频: {video_path}")
     print(f"FPS: {fps:.3f}, 每 {sample_seconds}s 取一帧 -> 步长 {step}")
     print(f"阈值: {threshold}, 裁剪: {crop_region if crop_region else ('auto' if auto_crop else '无')}, 缩放宽度: {scale_width if scale_width else '不缩放'}")
+    if start_seconds is not None or end_seconds is not None:
+        print(f"时间范围: {start_seconds if start_seconds is not None else 0}s - {end_seconds if end_seconds is not None else '结尾'}")
     print(f"临时输出目录: {output_dir}")
 
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -135,14 +174,24 @@ def extract_frames_to_pdf(
     saved_paths: List[Path] = []
     global_trim_bounds: Optional[Tuple[int, int, int, int]] = None  # (y0, y1, x0, x1) offsets within save_img
 
+    pending_frame = first_frame
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if frame_index % step != 0:
-            frame_index += 1
-            continue
+        if pending_frame is not None:
+            frame, pending_frame = pending_frame, None
+        else:
+            # grab() only demuxes/decodes; the BGR conversion in retrieve() is paid for sampled frames only
+            if not cap.grab():
+                break
+            if end_ms is not None and cap.get(cv2.CAP_PROP_POS_MSEC) >= end_ms:
+                break
+            if frame_index % step != 0:
+                frame_index += 1
+                continue
+            ret, frame = cap.retrieve(frame_buf)
+            if not ret:
+                break
+            # Whatever retrieve() returned (a fresh array if frame_buf was missing or mis-sized) is reused next time
+            frame_buf = frame
 
         work = frame
 
@@ -168,7 +217,11 @@ def extract_frames_to_pdf(
                 continue
             work = work[y0:y1, x0:x1]
 
-        gray = cv2.cvtColor(work, cv2.COLOR_BGR2GRAY)
+        gray_dst = None
+        if gray_buf is not None and gray_buf.size >= work.shape[0] * work.shape[1]:
+            # Contiguous view over the head of the buffer, fits any crop of the frame
+            gray_dst = gray_buf.reshape(-1)[:work.shape[0] * work.shape[1]].reshape(work.shape[:2])
+        gray = cv2.cvtColor(work, cv2.COLOR_BGR2GRAY, dst=gray_dst)
         bits = compute_phash_bits(gray)
 
         is_new_slide = last_bits is None or hamming_distance(bits, last_bits) >= threshold
@@ -265,6 +318,8 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("--scale-width", type=int, default=None, help="将保留帧按宽度统一缩放(像素)。保持比例")
     parser.add_argument("--a4", action="store_true", help="将图片居中放置到A4(300DPI)页面上")
     parser.add_argument("--max-pages", type=int, default=None, help="限制最大页数(可选)")
+    parser.add_argument("--start-seconds", type=float, default=None, help="从该时间(秒)开始提取(可选)")
+    parser.add_argument("--end-seconds", type=float, default=None, help="提取到该时间(秒)为止(可选)")
     parser.add_argument("--auto-trim", action="store_true", help="自动去除白色留白(默认仅上下)")
     parser.add_argument("--auto-trim-ratio", type=float, default=0.98, help="将行/列中白色像素占比>=该值视为留白(0~1)")
     parser.add_argument("--auto-trim-pad", type=int, default=6, help="在裁切边界上各留出像素余量")
@@ -312,6 +367,8 @@ def main(argv: Optional[List[str]] = None) -> int:
             auto_crop=bool(args.auto_crop),
             auto_crop_pad=int(args.auto_crop_pad),
             auto_crop_min_area_ratio=float(args.auto_crop_min_area_ratio),
+            start_seconds=args.start_seconds,
+            end_seconds=args.end_seconds,
         )
         return 0
     except Exception as exc: